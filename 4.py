@@ -5,18 +5,40 @@ import pandas as pd
 import pymysql
 import warnings
 import re
-from typing import Dict, List, Tuple
+import functools
+import itertools
+from typing import Dict, Tuple
 import json
+import csv
+import sqlite3
 import os
+import threading
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote_plus, unquote_plus
 
 warnings.filterwarnings('ignore')
 # ========== 配置常量 ==========
 HISTORY_FILE = "db_connection_history.txt"  # 历史连接存储文件
 URL_FORMAT = "{db_type}://{user}:{password}@{host}:{port}/{database}"  # URL拼接格式
+FETCH_CHUNK_SIZE = 1000  # 流式读取时每批拉取的行数
+EXPORT_CHUNK_SIZE = 10000  # 导出时每批拉取的行数
+COUNT_CACHE_SIZE = 256  # 总记录数查询结果缓存条数
+FILTER_DEBOUNCE_MS = 300  # 筛选输入防抖间隔（毫秒）
+QUERY_WORKERS = 3  # 后台查询线程数（数据查询 + 计数 + 导出）
+TOTAL_COUNT_COLUMN = "__total_count"  # 窗口函数计数列名（展示前移除）
+FILTER_CACHE_SIZE = 16  # 筛选结果缓存条数
+DEFAULT_COLUMN_WIDTH = 150  # 结果表格所有列默认固定宽度
+LOCAL_TABLE = "current_result"  # 本地 SQLite 结果表名
+_SERVER_VERSION_RE = re.compile(r'(\d+)\.(\d+)')  # 服务端版本号 主.次
+# SQL 末尾已有的 LIMIT 子句（LIMIT n / LIMIT m, n / LIMIT n OFFSET m）
+_LIMIT_TAIL_RE = re.compile(r'\blimit\s+\d+\s*(?:,\s*\d+\s*|offset\s+\d+\s*)?;?\s*$', re.IGNORECASE)
+
+
 # ========== 数据库连接类（优化版） ==========
 class DBConnector:
-    def __init__(self, db_type, host, port, user, password, database=None):
+    def __init__(self, db_type, host, port, user, password, database=None, ui_dispatch=None):
         self.db_type = db_type
         self.host = host
         self.port = port
@@ -25,6 +47,27 @@ class DBConnector:
         self.database = database
         self.conn = None
         self.cursor = None
+        # 第二个连接专用于 COUNT(*)，可与数据查询并行执行
+        self.count_conn = None
+        self.count_cursor = None
+        # pymysql 连接非线程安全，后台线程访问游标时需加锁（每个连接一把锁）
+        self.lock = threading.Lock()
+        self.count_lock = threading.Lock()
+        # 服务端是否支持窗口函数（MySQL 8.0+ / MariaDB 10.2+），连接后检测
+        self.supports_window_count = False
+        # 已关闭标记：连接正被后台查询占用时，由该查询结束后再真正关闭
+        self._closed = False
+        # 总记录数缓存：按SQL文本缓存 COUNT(*) 结果，每个连接实例独立
+        self._count_for_sql = functools.lru_cache(maxsize=COUNT_CACHE_SIZE)(self._query_count)
+        # 转交Tk主线程执行的回调 ui_dispatch(func, *args)，后台线程中弹消息框时使用
+        self.ui_dispatch = ui_dispatch
+
+    def show_error(self, title, message):
+        """弹出错误框；在后台线程中调用时转交Tk主线程执行"""
+        if self.ui_dispatch is None or threading.current_thread() is threading.main_thread():
+            messagebox.showerror(title, message)
+        else:
+            self.ui_dispatch(messagebox.showerror, title, message)
 
     # 端口校验 连接建立
     def connect(self):
@@ -37,15 +80,8 @@ class DBConnector:
 
         try:
             if self.db_type == "MySQL":
-                self.conn = pymysql.connect(
-                    host=self.host,
-                    port=port_int,
-                    user=self.user,
-                    password=self.password,
-                    database=self.database,
-                    charset='utf8mb4',  # 兼容更多字符
-                    connect_timeout=10
-                )
+                self.conn = self._connect_mysql(port_int)
+                self.count_conn = self._connect_mysql(port_int)
             # Hive连接（注释：需额外装依赖，先测试MySQL）
             # elif self.db_type == "Hive":
             #     from pyhive import hive
@@ -57,6 +93,9 @@ class DBConnector:
             #         database=self.database
             #     )
             self.cursor = self.conn.cursor()
+            self.count_cursor = self.count_conn.cursor()
+            self.supports_window_count = self._detect_window_support()
+            self.clear_count_cache()
             return True
         except pymysql.Error as e:
             messagebox.showerror("MySQL连接失败", f"错误码：{e.args[0]}，信息：{e.args[1]}")
@@ -65,100 +104,266 @@ class DBConnector:
             messagebox.showerror("连接失败", f"未知错误：{str(e)}")
             return False
 
-    # 执行SQL（增加行数限制，避免卡顿）
-    def execute_sql(self, sql, limit_rows=1000, disable_limit=False):
-        count_sql = None
-        try:
-            # 自动加行数限制，防止大数据量崩溃
-            if not sql.strip().upper().endswith("LIMIT") and "LIMIT" not in sql.upper():
-                sql += f" LIMIT {limit_rows}"
+    def _connect_mysql(self, port_int):
+        return pymysql.connect(
+            host=self.host,
+            port=port_int,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset='utf8mb4',  # 兼容更多字符
+            connect_timeout=10,
+            cursorclass=pymysql.cursors.SSCursor  # 服务端游标，流式读取不在客户端整体缓存
+        )
 
-            print(f"执行SQL：{sql}")
-            self.cursor.execute(sql)
+    def _detect_window_support(self):
+        """根据服务端版本判断是否支持 COUNT(*) OVER ()"""
+        info = self.conn.get_server_info()
+        if "MariaDB" in info:
+            if info.startswith("5.5.5-"):  # MariaDB 兼容前缀
+                info = info[len("5.5.5-"):]
+            min_version = (10, 2)
+        else:
+            min_version = (8, 0)
+        match = _SERVER_VERSION_RE.match(info)
+        return bool(match) and (int(match.group(1)), int(match.group(2))) >= min_version
 
-            # 获取列名
-            columns = [desc[0] for desc in self.cursor.description]
-            # 获取数据
-            data = self.cursor.fetchall()
+    # 执行SQL（增加行数限制，避免卡顿；disable_limit=True 时不追加LIMIT）
+    def execute_sql(self, sql, limit_rows=1000, disable_limit=False, params=None):
+        try:
+            # 自动加行数限制，防止大数据量崩溃（SQL末尾已有LIMIT时不再追加）
+            limited = False
+            if not disable_limit and not _LIMIT_TAIL_RE.search(sql):
+                sql += f" LIMIT {limit_rows}"
+                limited = True
+
+            print(f"执行SQL：{sql}，参数：{params}")
+            with self._hold(self.lock, self._close_main):
+                self.cursor.execute(sql, params)
+
+                # 获取列名
+                columns = [desc[0] for desc in self.cursor.description]
+                # 获取数据（SSCursor 流式读取，避免驱动缓存 + DataFrame 两份全量数据）
+                if limited:
+                    # 已追加LIMIT，结果不超过 limit_rows，一次拉取即可
+                    data = self.cursor.fetchmany(limit_rows)
+                else:
+                    chunks = []
+                    while True:
+                        rows = self.cursor.fetchmany(FETCH_CHUNK_SIZE)
+                        if not rows:
+                            break
+                        chunks.append(rows)
+                    data = list(itertools.chain.from_iterable(chunks))
             df = pd.DataFrame(data, columns=columns)
             return df
         except pymysql.Error as e:
-            messagebox.showerror("执行失败", f"MySQL错误：{e.args[0]} - {e.args[1]}")
+            if not self._closed:  # 连接已关闭（重连/退出）时，过期查询的报错直接忽略
+                self.show_error("执行失败", f"MySQL错误：{e.args[0]} - {e.args[1]}")
             return None
         except Exception as e:
-            messagebox.showerror("执行失败", f"SQL执行出错：{str(e)}")
+            if not self._closed:
+                self.show_error("执行失败", f"SQL执行出错：{str(e)}")
             return None
 
-    def get_total_count(self, sql):
+    def iter_sql(self, sql, params=None, chunksize=EXPORT_CHUNK_SIZE):
+        """
+        在独立连接上流式执行SQL（不加LIMIT），导出期间不占用预览/计数连接，
+        内存占用只与 chunksize 相关；出错或连接被关闭时直接抛异常
+        :return: 生成器，首个元素为 (列名列表, 列类型列表[(type_code, precision, scale)])，
+                 之后每个元素为一批数据行
+        """
+        print(f"流式执行SQL：{sql}，参数：{params}")
+        conn = self._connect_mysql(int(self.port))
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            yield (
+                [desc[0] for desc in cursor.description],
+                [(desc[1], desc[4], desc[5]) for desc in cursor.description]
+            )
+            while True:
+                if self._closed:
+                    raise RuntimeError("数据库连接已关闭，导出中止")
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # 直接关闭连接，未读取的数据由服务端丢弃
+            conn.close()
+
+    def execute_sql_with_count(self, sql, limit_rows=1000, disable_limit=False, params=None, count_cap=None):
+        """
+        一次查询同时取数据与总记录数：投影中追加 COUNT(*) OVER ()，
+        避免再单独执行一遍 COUNT(*) 子查询
+        :param count_cap: 计数上限，指定时最多统计到该行数（结果等于上限表示超出）
+        :return: (df, total_count)；执行失败时 (None, None)
+        """
+        if count_cap:
+            # 先截断到上限再开窗，计数代价与原查询结果量无关
+            sql = f"SELECT * FROM ({sql}) AS _c LIMIT {count_cap}"
+        count_sql = f"SELECT t.*, COUNT(*) OVER () AS {TOTAL_COUNT_COLUMN} FROM ({sql}) AS t"
+        df = self.execute_sql(count_sql, limit_rows=limit_rows, disable_limit=disable_limit, params=params)
+        if df is None:
+            return None, None
+        total_count = int(df[TOTAL_COUNT_COLUMN].iloc[0]) if not df.empty else 0
+        return df.drop(columns=[TOTAL_COUNT_COLUMN]), total_count
+
+    def get_total_count(self, sql, params=None, cap=None):
         """
         根据给定的 SQL 查询总记录数
-        :param sql: 原始 SQL 查询语句
+        :param sql: 原始 SQL 查询语句（可含 %s 占位符）
+        :param params: 占位符参数（元组），无参数时为 None
+        :param cap: 计数上限，None 表示精确计数
         :return: 总记录数（int）或 None（如果执行失败）
         """
         try:
-            # 构造 COUNT(*) 查询
-            count_sql = f"SELECT COUNT(*) AS total_count FROM ({sql}) AS subquery"
-
-            # 执行查询
-            self.cursor.execute(count_sql)
-
-            # 获取结果
-            result = self.cursor.fetchone()
-            total_count = result[0] if result else 0
-
-            return total_count
+            # 相同SQL模板+参数直接命中缓存，避免重复 COUNT(*) 往返
+            return self._count_for_sql(sql, params, cap)
         except pymysql.Error as e:
-            messagebox.showerror("执行失败", f"MySQL错误：{e.args[0]} - {e.args[1]}")
+            if not self._closed:
+                self.show_error("执行失败", f"MySQL错误：{e.args[0]} - {e.args[1]}")
             return None
         except Exception as e:
-            messagebox.showerror("执行失败", f"SQL执行出错：{str(e)}")
+            if not self._closed:
+                self.show_error("执行失败", f"SQL执行出错：{str(e)}")
             return None
 
+    def get_total_count_capped(self, sql, params, cap):
+        """
+        统计总记录数，最多数到 cap 行：结果等于 cap 表示实际行数不少于 cap，
+        查询代价有上限，不随原查询结果量增长
+        """
+        return self.get_total_count(sql, params, cap=cap)
+
+    def _query_count(self, sql, params=None, cap=None):
+        """在计数专用连接上执行 COUNT(*) 查询（出错时抛异常，不会写入缓存）"""
+        # 构造 COUNT(*) 查询
+        if cap:
+            count_sql = f"SELECT COUNT(*) AS total_count FROM (SELECT 1 FROM ({sql}) AS _t LIMIT {cap}) AS _c"
+        else:
+            count_sql = f"SELECT COUNT(*) AS total_count FROM ({sql}) AS subquery"
+
+        # 执行查询并获取结果
+        with self._hold(self.count_lock, self._close_count):
+            self.count_cursor.execute(count_sql, params)
+            result = self.count_cursor.fetchone()
+        return result[0] if result else 0
+
+    def clear_count_cache(self):
+        """清空总记录数缓存（重连或数据变更后调用）"""
+        self._count_for_sql.cache_clear()
+
     # 关闭连接
     def close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        """
+        关闭连接（不阻塞）：连接空闲时立即关闭；
+        正被后台查询占用时，由该查询结束后关闭，进行中的导出在下一批数据前中止
+        """
+        self._closed = True
+        for lock, close_func in ((self.lock, self._close_main), (self.count_lock, self._close_count)):
+            if lock.acquire(blocking=False):
+                try:
+                    close_func()
+                finally:
+                    lock.release()
+
+    @contextlib.contextmanager
+    def _hold(self, lock, close_func):
+        """占用连接执行查询；期间连接被关闭时，使用结束后再真正关闭"""
+        with lock:
+            try:
+                yield
+            finally:
+                if self._closed:
+                    close_func()
+
+    def _close_main(self):
+        self.cursor, self.conn = self._close_pair(self.cursor, self.conn)
+
+    def _close_count(self):
+        self.count_cursor, self.count_conn = self._close_pair(self.count_cursor, self.count_conn)
+
+    @staticmethod
+    def _close_pair(cursor, conn):
+        try:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        except Exception as e:
+            print(f"关闭连接出错：{str(e)}")
+        return None, None
 
 
 # ========== 历史连接管理工具 ==========
 class DBHistoryManager:
-    @staticmethod
-    def load_history():
+    # 历史连接内存状态 {url: config}：首次访问时读取文件，之后在内存中合并更新；
+    # 文件修改时间变化（被外部修改）时才重新读取
+    _cache = None
+    _cache_mtime = None
+    _line_count = 0  # 文件中的记录行数（含已被覆盖的旧记录），用于判断是否需要压缩
+
+    @classmethod
+    def load_history(cls):
         """加载历史连接信息，返回字典 {url: config}"""
-        history = {}
+        return dict(cls._load_state())
+
+    @classmethod
+    def _load_state(cls):
+        """返回内存中的历史连接字典（按需读取文件）"""
         if not os.path.exists(HISTORY_FILE):
-            return history
+            cls._cache, cls._cache_mtime, cls._line_count = {}, None, 0
+            return cls._cache
 
         try:
+            mtime = os.path.getmtime(HISTORY_FILE)
+            if cls._cache is not None and mtime == cls._cache_mtime:
+                return cls._cache
+
+            history = {}
+            line_count = 0
             with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                for line in f.readlines():
+                for line in f:
                     line = line.strip()
                     if not line:
                         continue
                     config = json.loads(line)
-                    url = DBHistoryManager._generate_url(config)
-                    history[url] = config
+                    url = cls._generate_url(config)
+                    history[url] = config  # 后出现的记录覆盖先前的记录
+                    line_count += 1
+            cls._cache, cls._cache_mtime, cls._line_count = history, mtime, line_count
         except Exception as e:
             messagebox.showerror("加载失败", f"读取历史连接失败：{str(e)}")
-        return history
+            return {}
+        return cls._cache
 
-    @staticmethod
-    def save_history(config):
-        """保存连接信息到历史文件（去重）"""
+    @classmethod
+    def save_history(cls, config):
+        """保存连接信息到历史文件（内存去重，文件只追加一行）"""
         config = {k: v for k, v in config.items() if v is not None and v != ""}
         if not config.get("host") or not config.get("port") or not config.get("user"):
             return
 
-        new_url = DBHistoryManager._generate_url(config)
-        history = DBHistoryManager.load_history()
+        new_url = cls._generate_url(config)
+        history = cls._load_state()
+        if history.get(new_url) == config:
+            return  # 已存在且内容相同，无需写文件
         history[new_url] = config  # 去重更新
 
         try:
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                for config in history.values():
+            if cls._line_count + 1 > 2 * len(history):
+                # 旧记录过多：按内存状态整体重写，压缩文件
+                with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
+                    for item in history.values():
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                cls._line_count = len(history)
+            else:
+                with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
                     f.write(json.dumps(config, ensure_ascii=False) + "\n")
+                cls._line_count += 1
+            cls._cache, cls._cache_mtime = history, os.path.getmtime(HISTORY_FILE)
         except Exception as e:
             messagebox.showerror("保存失败", f"保存历史连接失败：{str(e)}")
 
@@ -203,64 +408,56 @@ class DBHistoryManager:
 
 
 # ========== SQL解析类（优化版） ==========
+_WITH_RE = re.compile(r'\bwith\b', re.IGNORECASE)
+# CTE 头部：可选的空白/逗号 + 名称 + AS (
+_CTE_NAME_RE = re.compile(r'[\s,]*(?P<name>[a-zA-Z_][a-zA-Z0-9_]*)\s+as\s*\(', re.IGNORECASE)
+_PAREN_RE = re.compile(r'[()]')
+
+
 class SQLParser:
     @staticmethod
-    def parse_cte_sql(sql: str) -> List[Tuple[str, str]]:
+    @functools.lru_cache(maxsize=128)
+    def parse_cte_sql(sql: str) -> Tuple[Tuple[str, str], ...]:
         """
-        解析 WITH CTE，返回有序列表：
-        [
+        解析 WITH CTE，返回有序元组（按SQL文本缓存，重复解析直接命中）：
+        (
           (cte_name, cte_sql),
           ...
-        ]
+        )
         """
         sql = sql.strip()
-        match = re.search(r'\bwith\b', sql, re.IGNORECASE)
+        match = _WITH_RE.search(sql)
         if not match:
-            return []
+            return ()
 
         pos = match.end()
         length = len(sql)
         ctes = []
 
         while pos < length:
-            # 跳过空白和逗号
-            while pos < length and sql[pos] in " \n\t,":
-                pos += 1
-
-            # 读取 CTE 名称
-            name_match = re.match(r'([a-zA-Z_][a-zA-Z0-9_]*)', sql[pos:])
+            # 跳过空白和逗号，读取 CTE 名称，必须紧跟 AS (
+            name_match = _CTE_NAME_RE.match(sql, pos)
             if not name_match:
                 break
 
-            cte_name = name_match.group(1)
-            pos += name_match.end()
-
-            # 跳过空白
-            while pos < length and sql[pos].isspace():
-                pos += 1
+            cte_name = name_match.group("name")
+            start = name_match.end()  # "(" 之后
 
-            # 必须是 AS (
-            if not re.match(r'(?i)as\s*\(', sql[pos:]):
-                break
-
-            # 找到 "("
-            pos = sql.lower().find("(", pos)
-            start = pos + 1
-
-            # 括号匹配
+            # 括号匹配：只遍历括号字符，跳过其余内容
             bracket_count = 1
-            pos += 1
-            while pos < length and bracket_count > 0:
-                if sql[pos] == "(":
+            end = length
+            for paren in _PAREN_RE.finditer(sql, start):
+                if paren.group() == "(":
                     bracket_count += 1
-                elif sql[pos] == ")":
+                else:
                     bracket_count -= 1
-                pos += 1
+                    if bracket_count == 0:
+                        end = paren.start()
+                        break
 
-            end = pos - 1
             cte_sql = sql[start:end].strip()
-
             ctes.append((cte_name, cte_sql))
+            pos = end + 1
 
             # 判断是否还有下一个 CTE
             while pos < length and sql[pos].isspace():
@@ -268,30 +465,27 @@ class SQLParser:
             if pos >= length or sql[pos] != ",":
                 break
 
-        return ctes
+        return tuple(ctes)
 
-    def build_executable_cte_sql(ctes: List[Tuple[str, str]]) -> Dict[str, str]:
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def build_executable_cte_sql(ctes: Tuple[Tuple[str, str], ...]) -> Dict[str, str]:
         """
         构建「可执行 SQL」：
         每个 CTE 都包含之前所有 CTE 定义
+        （ctes 需为元组以便缓存；返回的字典为缓存共享对象，调用方勿修改）
         """
         result = {}
-        accumulated = []
+        prefix = ""  # 累积的 WITH 前缀，逐个追加，避免每次重新拼接全部 CTE
 
         for name, sql_body in ctes:
-            accumulated.append((name, sql_body))
-
-            with_parts = []
-            for n, s in accumulated:
-                with_parts.append(f"{n} AS (\n{s}\n)")
-
-            full_sql = (
-                    "WITH\n" +
-                    ",\n".join(with_parts) +
-                    f"\nSELECT * FROM {name}"
-            )
+            block = f"{name} AS (\n{sql_body}\n)"
+            if prefix:
+                prefix = prefix + ",\n" + block
+            else:
+                prefix = "WITH\n" + block
 
-            result[name] = full_sql
+            result[name] = prefix + f"\nSELECT * FROM {name}"
 
         return result
 
@@ -327,6 +521,27 @@ class SubQueryTool:
         self.history_dict = {}
         # 新增：筛选条件存储
         self.filter_conditions = {}
+        # 筛选防抖：待执行的 after 任务ID
+        self._filter_after_id = None
+
+        # 后台查询线程池，避免数据库往返阻塞Tk事件循环
+        self.executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+        # 关闭窗口时停止线程池，未开始的查询直接取消
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # 查询序号：只展示最近一次发起的查询结果，丢弃过期回调
+        self._query_seq = 0
+        # 执行中的子查询序号：结果返回前，结果/筛选状态仍属于上一次查询
+        self._pending_cte_seq = None
+        # 筛选结果LRU缓存：(筛选SQL, 参数) -> (df, total_count)，来回切换筛选条件时不再查库
+        self._filter_cache = OrderedDict()
+        # 结果表格当前列，列未变化时不再重复配置表头
+        self._last_columns = ()
+        # 筛选控件对应的列，列未变化时复用控件
+        self._filter_columns_key = ()
+        # 本地内存 SQLite：子查询结果全部在预览范围内时物化，筛选不再访问数据库
+        self._local_conn = None
+        # 本地表中可按文本筛选的列
+        self._local_text_columns = set()
 
         # 1. 数据库连接配置区域
         self.create_db_config_area()
@@ -451,6 +666,7 @@ class SubQueryTool:
     def clear_filter_conditions(self):
         if not hasattr(self, 'filter_conditions') or not self.filter_conditions:
              return
+        self.cancel_pending_filter()
         # 清空所有筛选输入框
         for col, entry in self.filter_conditions.items():
             entry.delete(0, tk.END)
@@ -508,7 +724,7 @@ class SubQueryTool:
         # 创建 LabelFrame 并保存为实例变量
         self.result_frame = ttk.LabelFrame(
             self.root,
-            text=f"查询结果: 共查询到记录数：{self.total_count}条,（最多展示1000行）"
+            text=f"查询结果: 共查询到记录数：{self.format_total_count()}条,（最多展示1000行）"
         )
         self.result_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
@@ -563,6 +779,13 @@ class SubQueryTool:
     # 展示结果（新增筛选器功能）
     def create_filter_widgets(self, columns):
         """为每个列创建筛选控件"""
+        # 列未变化时复用已有控件，只清空输入内容
+        if tuple(columns) == self._filter_columns_key and self.filter_conditions:
+            for entry in self.filter_conditions.values():
+                entry.delete(0, tk.END)
+            return
+        self._filter_columns_key = tuple(columns)
+
         # 清空原有筛选控件
         for widget in self.filter_frame.winfo_children():
             widget.destroy()
@@ -633,53 +856,161 @@ class SubQueryTool:
 
 
     def on_filter_input(self):
+        """条件查询防抖：短时间内连续点击只执行最后一次查询"""
+        self.cancel_pending_filter()
+        self._filter_after_id = self.root.after(FILTER_DEBOUNCE_MS, self._do_filter_query)
 
-        if self.result_df is None or self.result_df.empty:
-            return
+    def cancel_pending_filter(self):
+        """取消尚未执行的防抖筛选任务"""
+        if self._filter_after_id:
+            self.root.after_cancel(self._filter_after_id)
+            self._filter_after_id = None
 
-        # 获取所有筛选条件
-        filter_vals = {}
+    def _do_filter_query(self):
+        self._filter_after_id = None
 
-        for col, entry in self.filter_conditions.items():
-            val = entry.get().strip()
-            if val:
-                filter_vals[col] = val
+        if self.is_cte_pending():
+            return
+
+        if self.result_df is None or self.result_df.empty:
+            return
 
         # 核心修改：不再内存过滤，而是拼接SQL条件重新查询数据库
         if not self.original_sql or self.db_connector is None:
             messagebox.showwarning("警告", "无有效原始查询SQL，无法执行数据库端筛选")
             return
-        # 拼接WHERE条件
+        full_sql, params = self.build_filter_sql()
+        seq = self.next_query_seq()
+
+        # 命中缓存直接展示
+        cache_key = (full_sql, params)
+        cached = self._filter_cache.get(cache_key)
+        if cached is not None:
+            self._filter_cache.move_to_end(cache_key)
+            self._on_filter_done(seq, cached)
+            return
+
+        # 结果已全部物化到本地、且只筛选文本列时（文本比较与 MySQL 一致），直接在 SQLite 中筛选
+        if self._local_conn is not None and set(self.get_filter_values()) <= self._local_text_columns:
+            local_sql, local_params = self.build_local_filter_sql()
+            try:
+                filtered_df = pd.read_sql_query(local_sql, self._local_conn, params=local_params)
+            except Exception as e:
+                messagebox.showerror("执行失败", f"本地筛选出错：{str(e)}")
+                return
+            self._on_filter_done(seq, (filtered_df, len(filtered_df)), cache_key)
+            return
+
+        # 执行数据库端筛选（后台线程）
+        self.run_query_with_count(
+            self.db_connector, full_sql,
+            lambda result: self._on_filter_done(seq, result, cache_key),
+            params=params
+        )
+
+    def build_filter_sql(self):
+        """
+        根据筛选输入框构造参数化筛选SQL（%s 占位，值交给驱动转义）
+        :return: (sql, params)；无筛选条件时 params 为 None
+        """
+        filter_vals = self.get_filter_values()
+        base_sql = f"SELECT * FROM ({self.original_sql}) as table_name WHERE 1=1"
+        if not filter_vals:
+            return base_sql, None
+
+        # 带参数执行时驱动会做 % 格式化，SQL文本中原有的 % 需转义
+        base_sql = base_sql.replace("%", "%%")
+        fuzzy = self.search_mode.get() == "fuzzy"
         where_conditions = []
+        params = []
         for col, val in filter_vals.items():
-            # 构造模糊查询条件（兼容字符串/数字，防止SQL注入，这里简单处理，生产环境需用参数化）
-            # where_conditions.append(f"`{col}` LIKE '%{val}%'")
+            quoted_col = "`" + col.replace("`", "``").replace("%", "%%") + "`"
+            # 根据查询模式构造条件
+            if fuzzy:
+                where_conditions.append(f"{quoted_col} LIKE %s")
+                params.append(f"%{val}%")
+            else:
+                where_conditions.append(f"{quoted_col} = %s")
+                params.append(val)
+
+        return f"{base_sql} AND {' AND '.join(where_conditions)}", tuple(params)
 
-            # 根据查询模式构造SQL
-            if self.search_mode.get() == "fuzzy":
-                where_conditions.append(f"`{col}` LIKE '%{val}%'")
+    def build_local_filter_sql(self):
+        """
+        构造本地 SQLite 筛选SQL（? 占位），
+        精确匹配使用 NOCASE，与 MySQL 默认不区分大小写的排序规则保持一致
+        :return: (sql, params)
+        """
+        filter_vals = self.get_filter_values()
+        fuzzy = self.search_mode.get() == "fuzzy"
+        where_conditions = ["1=1"]
+        params = []
+        for col, val in filter_vals.items():
+            quoted_col = '"' + col.replace('"', '""') + '"'
+            if fuzzy:
+                where_conditions.append(f"{quoted_col} LIKE ?")
+                params.append(f"%{val}%")
             else:
-                 where_conditions.append(f"`{col}` = '{val}'")
+                where_conditions.append(f"{quoted_col} = ? COLLATE NOCASE")
+                params.append(val)
+        return f"SELECT * FROM {LOCAL_TABLE} WHERE {' AND '.join(where_conditions)}", params
 
+    def get_filter_values(self):
+        """获取所有非空筛选条件 {列名: 值}"""
+        filter_vals = {}
+        for col, entry in self.filter_conditions.items():
+            val = entry.get().strip()
+            if val:
+                filter_vals[col] = val
+        return filter_vals
 
-        # 重构SQL：原始SQL + WHERE条件
-        filter_sql = self.original_sql
-        base_sql = f"SELECT * FROM ({filter_sql}) as table_name WHERE 1=1"
-        # 如果where_conditions不为空，则添加条件
-        if where_conditions:
-            # 确保每个条件都用AND连接，并去除末尾多余的AND
-            conditions_str = " AND ".join(where_conditions)
-            full_sql = f"{base_sql} AND {conditions_str}"
-        else:
-            full_sql = base_sql
-        # 执行数据库端筛选
-        filtered_df = self.db_connector.execute_sql(full_sql,disable_limit= True)
+    def materialize_local_result(self):
+        """
+        子查询结果全部在预览范围内时，写入内存 SQLite 供后续筛选使用；
+        结果被截断或写入失败时不物化，筛选仍走数据库。
+        只有文本列的本地比较与 MySQL 等价（数值/DECIMAL/日期列按文本比较会漏匹配），
+        筛选条件涉及非文本列时仍走数据库
+        """
+        self.close_local_result()
+        if self.total_count is None or self.total_count > len(self.result_df):
+            return
+        conn = None
+        try:
+            # 按展示文本存储（空值保留为 NULL），本地筛选结果与预览展示一致
+            local_df = self.result_df.astype(str).where(self.result_df.notna(), None)
+            conn = sqlite3.connect(":memory:")
+            local_df.to_sql(LOCAL_TABLE, conn, index=False)
+        except Exception as e:
+            if conn is not None:
+                conn.close()
+            print(f"结果物化到本地失败，筛选将查询数据库：{str(e)}")
+            return
+        self._local_conn = conn
+        self._local_text_columns = {
+            col for col in self.result_df.columns
+            if pd.api.types.infer_dtype(self.result_df[col], skipna=True) in ("string", "empty")
+        }
+
+    def close_local_result(self):
+        if self._local_conn is not None:
+            self._local_conn.close()
+            self._local_conn = None
+        self._local_text_columns = set()
+
+    def _on_filter_done(self, seq, result, cache_key=None):
+        if seq != self._query_seq:
+            return
+        filtered_df, total_count = result
+        if cache_key is not None and filtered_df is not None:
+            self._filter_cache[cache_key] = result
+            if len(self._filter_cache) > FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
         if filtered_df is None or filtered_df.empty:
             messagebox.showinfo("提示", "无匹配筛选结果")
             self.show_filtered_result(pd.DataFrame())
             return
 
-        self.total_count = self.db_connector.get_total_count(full_sql)
+        self.total_count = total_count
 
         # 动态更新结果区域标题
         self.update_result_title()
@@ -689,14 +1020,22 @@ class SubQueryTool:
 
     def show_filtered_result(self, df):
         # 清空表格
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
+        self.clear_result_tree()
 
         # 插入筛选后的数据
-        for _, row in df.iterrows():
-            values = [str(val) for val in row.values]
-            self.result_tree.insert("", "end", values=values)
-            # self.result_tree.insert("", tk.END, values=list(row))
+        self.insert_rows(df)
+
+    def insert_rows(self, df):
+        """批量插入数据行：一次性向量化转为字符串列表，空值显示为空白"""
+        insert = self.result_tree.insert
+        for values in df.fillna("").astype(str).to_numpy().tolist():
+            insert("", tk.END, values=values)
+
+    def clear_result_tree(self):
+        """一次调用删除表格中的全部行"""
+        children = self.result_tree.get_children()
+        if children:
+            self.result_tree.delete(*children)
 
     # ==============================
     # 筛选区域展开/收起
@@ -720,17 +1059,110 @@ class SubQueryTool:
             self.toggle_filter_btn.config(text="展开")
             self.filter_expanded = False
 
+    # ==============================
+    # 后台查询
+    # ==============================
+
+    def dispatch_to_ui(self, func, *args):
+        """从后台线程转交Tk主线程执行 func(*args)；窗口已关闭时忽略"""
+        try:
+            self.root.after(0, func, *args)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def on_close(self):
+        """关闭窗口：取消待执行的查询并停止线程池，不等待进行中的任务"""
+        self.cancel_pending_filter()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # 不阻塞关闭连接，进行中的导出随之中止
+        if self.db_connector:
+            self.db_connector.close()
+        self.close_local_result()
+        self.root.destroy()
+
+    def is_cte_pending(self):
+        """子查询执行中时提示并返回 True（此时筛选/导出会作用于旧结果）"""
+        if self._pending_cte_seq is None:
+            return False
+        messagebox.showinfo("提示", "子查询执行中，请等待结果返回后再操作！")
+        return True
+
+    def next_query_seq(self):
+        """生成新的查询序号，之前未返回的查询结果将被丢弃"""
+        self._query_seq += 1
+        return self._query_seq
+
+    def run_query_with_count(self, connector, sql, callback, **kwargs):
+        """
+        后台查询数据与总记录数，完成后回到Tk主线程调用 callback((df, total_count))：
+        支持窗口函数时一次查询完成；否则在两个连接上并行执行数据查询与 COUNT(*)。
+        计数最多数到展示行数+1，超出部分只显示为"N+"
+        """
+        count_cap = self.query_limit + 1
+        if connector.supports_window_count:
+            future = self.executor.submit(
+                connector.execute_sql_with_count, sql, count_cap=count_cap, **kwargs
+            )
+            future.add_done_callback(
+                lambda f: self.dispatch_to_ui(self._dispatch_query_result, f, callback)
+            )
+            return
+
+        data_future = self.executor.submit(connector.execute_sql, sql, **kwargs)
+        count_future = self.executor.submit(
+            connector.get_total_count_capped, sql, kwargs.get("params"), count_cap
+        )
+        pending = [2]
+        pending_lock = threading.Lock()
+
+        def on_done(_):
+            with pending_lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            self.dispatch_to_ui(self._dispatch_query_with_count, data_future, count_future, callback)
+
+        data_future.add_done_callback(on_done)
+        count_future.add_done_callback(on_done)
+
+    def _dispatch_query_result(self, future, callback):
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("执行失败", f"后台查询出错：{str(e)}")
+            return
+        callback(result)
+
+    def _dispatch_query_with_count(self, data_future, count_future, callback):
+        try:
+            result = (data_future.result(), count_future.result())
+        except Exception as e:
+            messagebox.showerror("执行失败", f"后台查询出错：{str(e)}")
+            return
+        callback(result)
+
+    def format_total_count(self):
+        """总记录数展示文本：计数超过展示行数时显示为 N+"""
+        if self.total_count is not None and self.total_count > self.query_limit:
+            return f"{self.query_limit}+"
+        return self.total_count
+
     # 更新结果区域标题
     def update_result_title(self):
         self.result_frame.configure(
-            text=f"查询结果: 共查询到记录数：{self.total_count}条,（最多展示1000行）"
+            text=f"查询结果: 共查询到记录数：{self.format_total_count()}条,（最多展示1000行）"
         )
 
     # 连接数据库
     def connect_db(self):
-        # 清空旧连接
+        # 清空旧连接：作废旧连接上未完成的查询，其结果返回后直接丢弃
+        self.cancel_pending_filter()
+        self.next_query_seq()
+        self._pending_cte_seq = None
         if self.db_connector:
             self.db_connector.close()
+        self._filter_cache.clear()
+        self.close_local_result()
 
         # 获取配置
         db_type = self.db_type.get()
@@ -745,7 +1177,9 @@ class SubQueryTool:
             messagebox.showwarning("警告", "主机/端口/用户名不能为空！")
             return
 
-        self.db_connector = DBConnector(db_type, host, port, user, password, database)
+        self.db_connector = DBConnector(
+            db_type, host, port, user, password, database, ui_dispatch=self.dispatch_to_ui
+        )
         if self.db_connector.connect():
             messagebox.showinfo("成功", "数据库连接成功！")
 
@@ -769,9 +1203,10 @@ class SubQueryTool:
         if not sql:
             messagebox.showwarning("警告", "请输入SQL语句！")
             return
+        # 解析结果按SQL文本缓存，重复点击「解析子查询」直接命中
         cte_sql = SQLParser.parse_cte_sql(sql)
         executable_cte_sql = SQLParser.build_executable_cte_sql(cte_sql)
-        self.cte_dict = executable_cte_sql
+        self.cte_dict = dict(executable_cte_sql)
         if not self.cte_dict:
             messagebox.showinfo("提示", "未解析到WITH子句中的子查询！")
             return
@@ -796,18 +1231,35 @@ class SubQueryTool:
         cte_name = self.cte_listbox.get(selected_idx[0])
         cte_sql = self.cte_dict[cte_name]
 
-        # 保存原始SQL
-        self.original_sql = cte_sql.strip()
+        # 执行（后台线程），未执行的筛选任务、筛选缓存及计数缓存作废（重新执行即刷新）
+        self.cancel_pending_filter()
+        self._filter_cache.clear()
+        self.db_connector.clear_count_cache()
+        seq = self.next_query_seq()
+        self._pending_cte_seq = seq
+        self.run_query_with_count(
+            self.db_connector, cte_sql,
+            lambda result: self._on_cte_done(seq, cte_name, cte_sql, result),
+            limit_rows=self.query_limit
+        )
 
-        # 执行
-        self.result_df = self.db_connector.execute_sql(cte_sql, limit_rows=self.query_limit, disable_limit= True)
+    def _on_cte_done(self, seq, cte_name, cte_sql, result):
+        if seq == self._pending_cte_seq:
+            self._pending_cte_seq = None
+        if seq != self._query_seq:
+            return
+        # 结果返回后才切换原始SQL及结果状态
+        self.original_sql = cte_sql.strip()
+        self._filter_cache.clear()
+        self.result_df, total_count = result
+        self.close_local_result()
 
         if self.result_df is None or self.result_df.empty:
             messagebox.showinfo("提示", f"子查询{cte_name}执行完成，无数据返回！")
             return
 
-
-        self.total_count = self.db_connector.get_total_count(cte_sql)
+        self.total_count = total_count
+        self.materialize_local_result()
 
         # 动态更新结果区域标题
         self.update_result_title()
@@ -815,34 +1267,34 @@ class SubQueryTool:
         # 展示结果
         self.show_result()
         self.export_btn.config(state="normal")
-        messagebox.showinfo("成功", f"子查询{cte_name}执行完成，共{self.total_count}条数据！")
+        messagebox.showinfo("成功", f"子查询{cte_name}执行完成，共{self.format_total_count()}条数据！")
 
     # 展示结果
     def show_result(self):
         # 清空表格
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
+        self.clear_result_tree()
 
-        # 设置列
+        # 设置列（列未变化时跳过，筛选细化时常见）
         columns = list(self.result_df.columns)
-        self.result_tree["columns"] = columns
-        self.result_tree["show"] = "headings"
-        DEFAULT_COLUMN_WIDTH = 150  # 所有列默认固定宽度
-        for col in columns:
-            self.result_tree.heading(col, text=col, anchor='w')  # 表头居左
-            self.result_tree.column(col, width=120, anchor='w')  # 单元格数据居左
-            col_width = DEFAULT_COLUMN_WIDTH
-            self.result_tree.column(col, width=col_width, stretch=False)
-
+        if tuple(columns) != self._last_columns:
+            self.result_tree["columns"] = columns
+            self.result_tree["show"] = "headings"
+            for col in columns:
+                self.result_tree.heading(col, text=col, anchor='w')  # 表头居左
+                # 单元格数据居左，固定列宽
+                self.result_tree.column(col, width=DEFAULT_COLUMN_WIDTH, anchor='w', stretch=False)
+            self._last_columns = tuple(columns)
 
         # 插入数据
-        for _, row in self.result_df.iterrows():
-            self.result_tree.insert("", tk.END, values=list(row))
+        self.insert_rows(self.result_df)
         # 新增：创建筛选控件
         self.create_filter_widgets(columns)
 
     # 导出结果
     def export_result(self):
+        if self.is_cte_pending():
+            return
+
         if self.result_df is None or self.result_df.empty:
             messagebox.showwarning("警告", "暂无结果可导出！")
             return
@@ -851,62 +1303,173 @@ class SubQueryTool:
             messagebox.showwarning("警告", "无有效查询SQL，无法导出！")
             return
 
-        # 获取所有筛选条件
-        filter_vals = {}
-
-        for col, entry in self.filter_conditions.items():
-            val = entry.get().strip()
-            if val:
-                filter_vals[col] = val
-
         # 构造完整SQL（不加LIMIT）
-        base_sql = f"SELECT * FROM ({self.original_sql}) as table_name WHERE 1=1"
-        where_conditions = []
-        for col, val in filter_vals.items():
-            # where_conditions.append(f"`{col}` LIKE '%{val}%'")
-            if self.search_mode.get() == "fuzzy":
-                where_conditions.append(f"`{col}` LIKE '%{val}%'")
-            else:
-                where_conditions.append(f"`{col}` = '{val}'")
-
-
-
-        if where_conditions:
-            conditions_str = " AND ".join(where_conditions)
-            full_sql = f"{base_sql} AND {conditions_str}"
-        else:
-            full_sql = base_sql
-        # 重新查询数据库（不限制行数）
-        try:
-            export_df = self.db_connector.execute_sql(full_sql, limit_rows=999999999, disable_limit=False)
-            if export_df is None or export_df.empty:
-                messagebox.showwarning("提示", "无数据可导出！")
-                return
-        except Exception as e:
-            messagebox.showerror("错误", f"导出查询失败：{str(e)}")
-            return
-
-
-
-
-
-
+        full_sql, params = self.build_filter_sql()
 
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel文件", "*.xlsx"), ("CSV文件", "*.csv")]
+            filetypes=[
+                ("Excel文件", "*.xlsx"),
+                ("CSV文件", "*.csv"),
+                ("Parquet文件", "*.parquet"),
+                ("Feather文件", "*.feather")
+            ]
         )
         if not file_path:
             return
 
+        # 后台线程流式查询并写文件，导出期间禁用导出按钮防止重复提交
+        self.export_btn.config(state="disabled")
+        future = self.executor.submit(
+            self._export_to_file, self.db_connector, full_sql, params, file_path
+        )
+        future.add_done_callback(
+            lambda f: self.dispatch_to_ui(self._on_export_done, f, file_path)
+        )
+
+    @staticmethod
+    def _export_to_file(connector, sql, params, file_path):
+        """后台线程中执行：分批拉取数据直接写入文件，返回导出行数"""
+        stream = connector.iter_sql(sql, params)
+        writing = False
         try:
+            columns, column_types = next(stream)
+            first_chunk = next(stream, [])
+            if not first_chunk:
+                return 0
+            chunks = itertools.chain([first_chunk], stream)
+            writing = True
             if file_path.endswith(".xlsx"):
-                export_df.to_excel(file_path, index=False, engine="openpyxl")
+                return SubQueryTool._write_xlsx(file_path, columns, chunks)
+            if file_path.endswith((".parquet", ".feather")):
+                return SubQueryTool._write_columnar(file_path, columns, column_types, chunks)
+            return SubQueryTool._write_csv(file_path, columns, chunks)
+        except Exception:
+            # 写到一半失败：删除不完整的文件
+            if writing and os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        finally:
+            # 提前结束时释放连接锁
+            stream.close()
+
+    @staticmethod
+    def _write_csv(file_path, columns, chunks):
+        total = 0
+        with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in chunks:
+                writer.writerows(rows)
+                total += len(rows)
+        return total
+
+    @staticmethod
+    def _write_xlsx(file_path, columns, chunks):
+        # write_only 模式逐行写出，内存占用恒定
+        import openpyxl
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(columns)
+        total = 0
+        for rows in chunks:
+            for row in rows:
+                ws.append(row)
+            total += len(rows)
+        wb.save(file_path)
+        return total
+
+    @staticmethod
+    def _write_columnar(file_path, columns, column_types, chunks):
+        # pyarrow 按批写出（schema 由列类型确定），内存占用只与批大小相关
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        writer = None
+        schema = None
+        total = 0
+        try:
+            for rows in chunks:
+                if schema is None:
+                    schema = SubQueryTool._arrow_schema(pa, columns, column_types, rows)
+                    if file_path.endswith(".parquet"):
+                        writer = pq.ParquetWriter(file_path, schema, compression="snappy")
+                    else:
+                        writer = pa.ipc.new_file(
+                            file_path, schema, options=pa.ipc.IpcWriteOptions(compression="lz4")
+                        )
+                arrays = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*rows), schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                total += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+    @staticmethod
+    def _arrow_schema(pa, columns, column_types, first_rows):
+        """
+        根据 cursor.description 的 MySQL 列类型确定 Arrow schema，不依赖数据内容；
+        TEXT/BLOB、CHAR/BINARY 共用类型码，仅这类列看首批数据是否为 bytes 决定 binary/string
+        """
+        FIELD_TYPE = pymysql.constants.FIELD_TYPE
+        fixed_types = {
+            FIELD_TYPE.TINY: pa.int64(),
+            FIELD_TYPE.SHORT: pa.int64(),
+            FIELD_TYPE.INT24: pa.int64(),
+            FIELD_TYPE.LONG: pa.int64(),
+            FIELD_TYPE.LONGLONG: pa.int64(),
+            FIELD_TYPE.YEAR: pa.int64(),
+            FIELD_TYPE.FLOAT: pa.float64(),
+            FIELD_TYPE.DOUBLE: pa.float64(),
+            FIELD_TYPE.DATE: pa.date32(),
+            FIELD_TYPE.NEWDATE: pa.date32(),
+            FIELD_TYPE.DATETIME: pa.timestamp("us"),
+            FIELD_TYPE.TIMESTAMP: pa.timestamp("us"),
+            FIELD_TYPE.TIME: pa.duration("us"),  # pymysql 返回 timedelta
+            FIELD_TYPE.BIT: pa.binary(),
+            FIELD_TYPE.GEOMETRY: pa.binary(),
+            FIELD_TYPE.NULL: pa.null(),
+        }
+        decimal_types = (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL)
+        first_columns = list(zip(*first_rows))
+        fields = []
+        for idx, (name, (type_code, precision, scale)) in enumerate(zip(columns, column_types)):
+            if type_code in fixed_types:
+                arrow_type = fixed_types[type_code]
+            elif type_code in decimal_types:
+                # 列长度含符号位和小数点；超出 decimal128 的 38 位时改用 decimal256
+                if precision and precision - 2 > 38:
+                    arrow_type = pa.decimal256(76, scale or 0)
+                else:
+                    arrow_type = pa.decimal128(38, scale or 0)
+            elif any(isinstance(v, bytes) for v in first_columns[idx]):
+                arrow_type = pa.binary()
             else:
-                export_df.to_csv(file_path, index=False, encoding="utf-8-sig")
-            messagebox.showinfo("成功", f"结果已导出到：{file_path}")
+                # VARCHAR/CHAR/TEXT/JSON/ENUM/SET 等（UTF-8 的 bytes 也可写入 string）
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    def _on_export_done(self, future, file_path):
+        self.export_btn.config(state="normal")
+        try:
+            total = future.result()
+        except pymysql.Error as e:
+            messagebox.showerror("失败", f"导出失败：MySQL错误：{e.args[0]} - {e.args[1]}")
+            return
         except Exception as e:
             messagebox.showerror("失败", f"导出失败：{str(e)}")
+            return
+
+        if not total:
+            messagebox.showwarning("提示", "无数据可导出！")
+            return
+        messagebox.showinfo("成功", f"共{total}条结果已导出到：{file_path}")
 
   # ==============================
   # 单元格复制功能